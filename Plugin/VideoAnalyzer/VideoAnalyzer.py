@@ -6,18 +6,18 @@ VideoAnalyzer Plugin - AI视频分析工具
 
 import sys
 import json
-import os
+import asyncio
 from pathlib import Path
-from dotenv import load_dotenv
+from config import get_config, load_env_file
 
 # 加载配置
 plugin_dir = Path(__file__).parent
-load_dotenv(plugin_dir / 'config.env')
+load_env_file(plugin_dir / 'config.env')
 
 # 加载主配置
 main_config_path = plugin_dir.parent.parent / 'config.env'
 if main_config_path.exists():
-    load_dotenv(main_config_path)
+    load_env_file(main_config_path)
 
 # 导入模块
 from video_downloader import VideoDownloader
@@ -25,39 +25,21 @@ from audio_extractor import AudioExtractor
 from transcriber import Transcriber
 from note_generator import NoteGenerator
 from screenshot_extractor import ScreenshotExtractor
+from media_extractor import MediaExtractor
 from result_saver import ResultSaver
+from media_probe import MediaProbe
+from json_utils import dumps
 
 
 class VideoAnalyzer:
     """视频分析器"""
     
     def __init__(self):
-        self.config = {
-            'whisper_api_key': os.getenv('WHISPER_API_KEY') or os.getenv('API_Key'),
-            'whisper_api_url': os.getenv('WHISPER_API_URL') or os.getenv('API_URL'),
-            'whisper_model': os.getenv('WHISPER_MODEL', 'whisper-1'),
-            'whisper_language': os.getenv('WHISPER_LANGUAGE', 'auto'),
-            'ai_api_key': os.getenv('AI_API_KEY') or os.getenv('API_Key'),
-            'ai_api_url': os.getenv('AI_API_URL') or os.getenv('API_URL'),
-            'ai_model': os.getenv('AI_MODEL', 'gpt-4o-mini'),
-            'ai_max_tokens': int(os.getenv('AI_MAX_TOKENS', '4000')),
-            'ffmpeg_path': os.getenv('FFMPEG_PATH', 'ffmpeg'),
-            'temp_dir': plugin_dir / os.getenv('TEMP_DIR', './temp'),
-            'output_dir': plugin_dir / os.getenv('OUTPUT_DIR', './output'),
-            'max_video_duration': int(os.getenv('MAX_VIDEO_DURATION', '3600')),
-            'audio_sample_rate': int(os.getenv('AUDIO_SAMPLE_RATE', '16000')),
-            'ytdlp_format': os.getenv('YTDLP_FORMAT', 'bestaudio/best'),
-            'download_timeout': int(os.getenv('DOWNLOAD_TIMEOUT', '300')),
-            'enable_screenshots': os.getenv('ENABLE_SCREENSHOTS', 'true').lower() == 'true',
-            'screenshot_interval': int(os.getenv('SCREENSHOT_INTERVAL', '30')),
-            'max_screenshots': int(os.getenv('MAX_SCREENSHOTS', '10')),
-            'debug': os.getenv('DEBUG', 'false').lower() == 'true',
-            'keep_temp_files': os.getenv('KEEP_TEMP_FILES', 'false').lower() == 'true'
-        }
+        self.config = get_config()
         
         # 创建目录
-        self.config['temp_dir'].mkdir(parents=True, exist_ok=True)
-        self.config['output_dir'].mkdir(parents=True, exist_ok=True)
+        self.config.temp_dir.mkdir(parents=True, exist_ok=True)
+        self.config.output_dir.mkdir(parents=True, exist_ok=True)
 
         # 初始化组件
         self.downloader = VideoDownloader(self.config)
@@ -65,12 +47,32 @@ class VideoAnalyzer:
         self.transcriber = Transcriber(self.config)
         self.generator = NoteGenerator(self.config)
         self.screenshot_extractor = ScreenshotExtractor(self.config)
+        self.media_extractor = MediaExtractor(self.config)
         self.result_saver = ResultSaver(self.config)
+        self.probe = MediaProbe(self.config)
     
     def analyze(self, url, mode='analyze', language=None, style='brief', custom_prompt=None):
+        """
+        分析视频（同步接口，内部通过asyncio并发执行各步骤）
+
+        Args:
+            url: 视频URL或本地文件路径
+            mode: 分析模式（download/transcribe/analyze/summary）
+            language: 音频语言
+            style: 笔记风格（academic/casual/detailed/brief/custom）
+            custom_prompt: 自定义提示词（当style='custom'时使用）
+
+        Returns:
+            dict: 分析结果
+        """
+        return asyncio.run(self.analyze_async(url, mode, language, style, custom_prompt))
+
+    async def analyze_async(self, url, mode='analyze', language=None, style='brief', custom_prompt=None):
         """
         分析视频
 
+        截图提取与音频提取+转文字互不依赖，并发执行。
+
         Args:
             url: 视频URL或本地文件路径
             mode: 分析模式（download/transcribe/analyze/summary）
@@ -83,7 +85,7 @@ class VideoAnalyzer:
         """
         video_id = None
         video_path = None
-        audio_path = None
+        audio_paths = []
 
         try:
             # 生成视频ID
@@ -91,10 +93,10 @@ class VideoAnalyzer:
             video_id = str(uuid.uuid4())
 
             # 1. 下载或获取视频文件
-            if self.config['debug']:
+            if self.config.debug:
                 print(f"[VideoAnalyzer] 处理视频: {url}", file=sys.stderr)
 
-            video_path = self.downloader.download(url)
+            video_path = await asyncio.to_thread(self.downloader.download, url)
 
             # 如果只是下载模式，直接返回
             if mode == 'download':
@@ -106,30 +108,39 @@ class VideoAnalyzer:
                     'content': f'视频已下载到: {video_path}'
                 }
 
-                if self.config['debug']:
+                if self.config.debug:
                     print(f"[VideoAnalyzer] 下载完成: {video_path}", file=sys.stderr)
 
                 return result
 
-            # 2. 提取截图
-            screenshots = []
-            if self.config['enable_screenshots'] and mode != 'transcribe':
-                if self.config['debug']:
-                    print(f"[VideoAnalyzer] 提取截图...", file=sys.stderr)
-
-                screenshots = self.screenshot_extractor.extract(video_path, video_id)
+            # 2-4. 提取截图、提取音频并转文字
+            want_screenshots = self.config.enable_screenshots and mode != 'transcribe'
 
-            # 3. 提取音频
-            if self.config['debug']:
-                print(f"[VideoAnalyzer] 提取音频...", file=sys.stderr)
+            duration = None
+            if want_screenshots and self._single_pass_applicable():
+                duration = await asyncio.to_thread(self.probe.get_duration, video_path)
+                chunk_seconds = self.config.transcribe_chunk_seconds
+                if duration <= 0 or (chunk_seconds > 0 and duration > chunk_seconds):
+                    duration = None
 
-            audio_path = self.extractor.extract(video_path)
-
-            # 4. 音频转文字
-            if self.config['debug']:
-                print(f"[VideoAnalyzer] 音频转文字...", file=sys.stderr)
+            screenshots = []
+            if duration is not None:
+                # 单次FFmpeg调用同时提取音频和截图，再转文字
+                screenshots, transcript, audio_paths, speech_ratio = await asyncio.to_thread(
+                    self._single_pass_sync, video_path, video_id, language, duration
+                )
+            elif want_screenshots:
+                # 截图与音频提取+转文字并发执行
+                if self.config.debug:
+                    print(f"[VideoAnalyzer] 提取截图...", file=sys.stderr)
 
-            transcript = self.transcriber.transcribe(audio_path, language)
+                transcript_task = asyncio.create_task(self._extract_and_transcribe(video_path, language))
+                screenshots_task = asyncio.create_task(
+                    self.screenshot_extractor.extract_async(video_path, video_id)
+                )
+                screenshots, (transcript, audio_paths, speech_ratio) = await asyncio.gather(screenshots_task, transcript_task)
+            else:
+                transcript, audio_paths, speech_ratio = await self._extract_and_transcribe(video_path, language)
 
             # 5. 根据模式处理
             result = {
@@ -139,28 +150,31 @@ class VideoAnalyzer:
                 'video_id': video_id
             }
 
+            if speech_ratio is not None:
+                result['speech_ratio'] = speech_ratio
+
             if mode == 'transcribe':
                 # 只返回转录文本
                 result['content'] = transcript
 
             elif mode == 'summary':
                 # 生成摘要
-                if self.config['debug']:
+                if self.config.debug:
                     print(f"[VideoAnalyzer] 生成摘要...", file=sys.stderr)
 
-                summary = self.generator.generate_summary(transcript)
+                summary = await asyncio.to_thread(self.generator.generate_summary, transcript)
                 result['content'] = summary
 
             else:  # mode == 'analyze'
                 # 生成完整笔记
-                if self.config['debug']:
+                if self.config.debug:
                     print(f"[VideoAnalyzer] 生成笔记...", file=sys.stderr)
 
-                notes = self.generator.generate_notes(transcript, style, custom_prompt)
+                notes = await asyncio.to_thread(self.generator.generate_notes, transcript, style, custom_prompt)
                 result['content'] = notes
 
             # 6. 保存结果
-            if self.config['debug']:
+            if self.config.debug:
                 print(f"[VideoAnalyzer] 保存结果...", file=sys.stderr)
 
             saved_files = self.result_saver.save(result, video_id, screenshots)
@@ -168,18 +182,113 @@ class VideoAnalyzer:
             result['screenshots'] = screenshots
 
             # 7. 清理临时文件
-            if not self.config['keep_temp_files']:
-                self._cleanup(video_path, audio_path)
+            if not self.config.keep_temp_files:
+                self._cleanup(video_path, *audio_paths)
 
             return result
 
         except Exception as e:
-            if self.config['debug']:
+            if self.config.debug:
                 import traceback
                 print(f"[VideoAnalyzer] 错误: {str(e)}", file=sys.stderr)
                 print(traceback.format_exc(), file=sys.stderr)
             raise
     
+    async def _extract_and_transcribe(self, video_path, language):
+        """
+        提取音频并转文字
+
+        Returns:
+            tuple: (转录文本, 生成的音频文件路径列表（流式提取时为空）,
+                    静音裁剪后的音频占比（仅调试模式下的磁盘提取路径，否则为None）)
+        """
+        return await asyncio.to_thread(self._extract_and_transcribe_sync, video_path, language)
+
+    def _extract_and_transcribe_sync(self, video_path, language):
+        """提取音频并转文字（在工作线程中执行）"""
+        # 本地模型直接解码视频中的音轨，无需提取和上传音频
+        if self.transcriber.is_local:
+            if self.config.debug:
+                print(f"[VideoAnalyzer] 本地模型转文字...", file=sys.stderr)
+
+            return self.transcriber.transcribe(video_path, language), [], None
+
+        # 长音频：按静音切分后并发转录
+        chunk_seconds = self.config.transcribe_chunk_seconds
+        if chunk_seconds > 0:
+            duration = self.probe.get_duration(video_path)
+            if duration > chunk_seconds:
+                if self.config.debug:
+                    print(f"[VideoAnalyzer] 分段提取音频并并发转文字...", file=sys.stderr)
+
+                audio_paths = self.extractor.extract_chunks(video_path, chunk_seconds, duration)
+                transcript = self.transcriber.transcribe_many(audio_paths, language)
+                return transcript, audio_paths, None
+
+        # 启用缓存时走磁盘路径，以便按音频内容哈希查找缓存；流式上传需要FFmpeg支持Opus
+        if self.config.stream_audio and self.transcriber.cache is None and self.extractor.supports_opus():
+            # 流式：FFmpeg输出直接上传，不生成中间音频文件
+            if self.config.debug:
+                print(f"[VideoAnalyzer] 流式提取音频并转文字...", file=sys.stderr)
+
+            process = self.extractor.extract_stream(video_path)
+            try:
+                transcript = self.transcriber.transcribe(process.stdout, language)
+            except Exception:
+                # FFmpeg出错时报告其错误输出，而不是上传空文件导致的API错误
+                self.extractor.abort_stream(process)
+                raise
+            self.extractor.finish_stream(process)
+            return transcript, [], None
+
+        if self.config.debug:
+            print(f"[VideoAnalyzer] 提取音频...", file=sys.stderr)
+
+        audio_path = self.extractor.extract(video_path)
+
+        if self.config.debug:
+            print(f"[VideoAnalyzer] 音频转文字...", file=sys.stderr)
+
+        transcript = self.transcriber.transcribe(audio_path, language)
+
+        return transcript, [audio_path], self._speech_ratio(video_path, audio_path)
+
+    def _single_pass_applicable(self):
+        """是否使用单次FFmpeg调用提取音频和截图（本地模型直接解码视频，无需提取音频）"""
+        return self.config.single_pass_extract and not self.transcriber.is_local
+
+    def _single_pass_sync(self, video_path, video_id, language, duration):
+        """
+        单次提取音频和截图后转文字（在工作线程中执行）
+
+        Returns:
+            tuple: (截图文件路径列表, 转录文本, 音频文件路径列表, 静音裁剪后的音频占比)
+        """
+        if self.config.debug:
+            print(f"[VideoAnalyzer] 单次提取音频和截图...", file=sys.stderr)
+
+        audio_path, screenshots = self.media_extractor.extract_all(video_path, video_id, duration)
+
+        if self.config.debug:
+            print(f"[VideoAnalyzer] 音频转文字...", file=sys.stderr)
+
+        transcript = self.transcriber.transcribe(audio_path, language)
+
+        return screenshots, transcript, [audio_path], self._speech_ratio(video_path, audio_path)
+
+    def _speech_ratio(self, video_path, audio_path):
+        """调试：记录静音裁剪后保留的音频比例，非调试模式返回None"""
+        if not (self.config.debug and self.config.vad_trim):
+            return None
+
+        video_duration = self.probe.get_duration(video_path)
+        if video_duration <= 0:
+            return None
+
+        speech_ratio = round(self.probe.get_duration(audio_path) / video_duration, 3)
+        print(f"[VideoAnalyzer] 静音裁剪后音频占比: {speech_ratio}", file=sys.stderr)
+        return speech_ratio
+
     def _cleanup(self, *paths):
         """清理临时文件"""
         for path in paths:
@@ -187,10 +296,17 @@ class VideoAnalyzer:
                 try:
                     Path(path).unlink()
                 except Exception as e:
-                    if self.config['debug']:
+                    if self.config.debug:
                         print(f"[VideoAnalyzer] 清理文件失败: {path} - {str(e)}", file=sys.stderr)
 
 
+def _emit(output):
+    """将结果JSON以UTF-8字节直接写入stdout，跳过文本层的再编码"""
+    sys.stdout.flush()
+    sys.stdout.buffer.write(dumps(output, indent=True) + b'\n')
+    sys.stdout.buffer.flush()
+
+
 def main():
     """主函数"""
     try:
@@ -225,14 +341,14 @@ def main():
             'result': result
         }
         
-        print(json.dumps(output, ensure_ascii=False, indent=2))
+        _emit(output)
         
     except Exception as e:
         output = {
             'status': 'error',
             'error': f'VideoAnalyzer错误: {str(e)}'
         }
-        print(json.dumps(output, ensure_ascii=False, indent=2))
+        _emit(output)
         sys.exit(1)
 
 
@@ -4,18 +4,50 @@
 """
 
 import sys
+import os
 import subprocess
+import threading
+from collections import deque
 from pathlib import Path
-import uuid
+from media_probe import MediaProbe
+
+
+# 去除开头0.5秒以上、中间1秒以上的静音（-35dB以下）
+SILENCE_REMOVE_FILTER = (
+    'silenceremove=start_periods=1:start_silence=0.5:start_threshold=-35dB'
+    ':stop_periods=-1:stop_silence=1.0:stop_threshold=-35dB'
+)
+
+# 只取第一条音轨，不解复用视频、字幕和数据流
+STREAM_SELECT_ARGS = ['-map', '0:a:0', '-vn', '-sn', '-dn']
+
+# Opus语音编码，体积约为16kHz WAV的十分之一；
+# bitexact保证相同输入得到相同字节，便于按内容哈希缓存转录结果
+OPUS_CODEC_ARGS = [
+    '-c:a', 'libopus',
+    '-b:a', '24k',
+    '-application', 'voip',
+    '-fflags', '+bitexact',
+    '-flags:a', '+bitexact'
+]
+
+# libopus只接受以下采样率，其他采样率回退为WAV
+OPUS_SAMPLE_RATES = frozenset([8000, 12000, 16000, 24000, 48000])
+
+WAV_CODEC_ARGS = ['-acodec', 'pcm_s16le']
 
 
 class AudioExtractor:
     """音频提取器"""
     
+    # 各FFmpeg路径是否支持libopus编码，进程内只检测一次
+    _opus_support = {}
+    
     def __init__(self, config):
         self.config = config
-        self.temp_dir = config['temp_dir']
-        self.ffmpeg_path = config['ffmpeg_path']
+        self.temp_dir = config.temp_dir
+        self.ffmpeg_path = config.ffmpeg_path
+        self.probe = MediaProbe(config)
     
     def extract(self, video_path):
         """
@@ -29,10 +61,11 @@ class AudioExtractor:
         """
         try:
             # 生成音频文件名
-            audio_id = str(uuid.uuid4())
-            audio_path = self.temp_dir / f"{audio_id}.wav"
+            audio_id = os.urandom(8).hex()
+            codec_args, suffix = self.codec_args()
+            audio_path = self.temp_dir / f"{audio_id}{suffix}"
             
-            if self.config['debug']:
+            if self.config.debug:
                 print(f"[AudioExtractor] 提取音频: {video_path}", file=sys.stderr)
             
             # 构建FFmpeg命令
@@ -43,22 +76,24 @@ class AudioExtractor:
             cmd = [
                 self.ffmpeg_path,
                 '-i', str(video_path_abs),
-                '-vn',  # 不处理视频
-                '-acodec', 'pcm_s16le',  # 音频编码
-                '-ar', str(self.config['audio_sample_rate']),  # 采样率
+                *STREAM_SELECT_ARGS,
+                *self.filter_args(),
+                *codec_args,
+                '-ar', str(self.config.audio_sample_rate),  # 采样率
                 '-ac', '1',  # 单声道
                 '-y',  # 覆盖输出文件
                 '-loglevel', 'error',  # 只显示错误
                 str(audio_path_abs)
             ]
 
-            if self.config['debug']:
+            if self.config.debug:
                 print(f"[AudioExtractor] FFmpeg命令: {' '.join(cmd)}", file=sys.stderr)
 
             # 执行FFmpeg
             result = subprocess.run(
                 cmd,
-                capture_output=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
                 text=True,
                 timeout=300
             )
@@ -69,7 +104,7 @@ class AudioExtractor:
             if not audio_path.exists():
                 raise RuntimeError("音频提取完成但未找到文件")
             
-            if self.config['debug']:
+            if self.config.debug:
                 print(f"[AudioExtractor] 提取完成: {audio_path}", file=sys.stderr)
             
             return str(audio_path)
@@ -80,4 +115,278 @@ class AudioExtractor:
             raise RuntimeError(f"未找到FFmpeg: {self.ffmpeg_path}")
         except Exception as e:
             raise RuntimeError(f"音频提取失败: {str(e)}")
+    
+    def filter_args(self):
+        """音频滤镜参数：启用VAD裁剪时去除长静音，减少需转录的音频时长"""
+        if self.config.vad_trim:
+            return ['-af', SILENCE_REMOVE_FILTER]
+        return []
+    
+    def supports_opus(self):
+        """检测能否以Opus编码：采样率须为libopus支持的值，且FFmpeg支持libopus（结果按FFmpeg路径缓存）"""
+        if self.config.audio_sample_rate not in OPUS_SAMPLE_RATES:
+            return False
+        
+        supported = self._opus_support.get(self.ffmpeg_path)
+        if supported is None:
+            try:
+                result = subprocess.run(
+                    [self.ffmpeg_path, '-hide_banner', '-encoders'],
+                    capture_output=True,
+                    text=True,
+                    timeout=10
+                )
+                supported = ' libopus ' in result.stdout
+            except (OSError, subprocess.TimeoutExpired):
+                supported = False
+            
+            self._opus_support[self.ffmpeg_path] = supported
+            
+            if self.config.debug and not supported:
+                print(f"[AudioExtractor] FFmpeg不支持libopus，回退为WAV", file=sys.stderr)
+        
+        return supported
+    
+    def codec_args(self):
+        """音频编码参数及输出文件扩展名：优先Opus，不支持时回退为WAV"""
+        if self.supports_opus():
+            return OPUS_CODEC_ARGS, '.ogg'
+        return WAV_CODEC_ARGS, '.wav'
+    
+    def extract_chunks(self, video_path, chunk_sec=300, duration=None):
+        """
+        将音频切分为多个分段，切分点尽量落在静音处
+        
+        Args:
+            video_path: 视频文件路径
+            chunk_sec: 目标分段时长（秒）
+            duration: 视频时长（秒，可选，未提供时自动探测）
+        
+        Returns:
+            list: 按时间顺序排列的分段音频文件路径
+        """
+        if duration is None:
+            duration = self.probe.get_duration(video_path)
+        
+        if duration <= chunk_sec:
+            return [self.extract(video_path)]
+        
+        try:
+            chunk_id = os.urandom(8).hex()
+            video_path_abs = Path(video_path).absolute()
+            
+            split_points = self._calculate_split_points(
+                duration, chunk_sec, self._detect_silences(video_path_abs)
+            )
+            
+            if not split_points:
+                return [self.extract(video_path)]
+            
+            if self.config.debug:
+                print(f"[AudioExtractor] 分段提取音频，切分点: {split_points}", file=sys.stderr)
+            
+            # 切分点基于原始时间轴，分段时不做静音裁剪
+            codec_args, suffix = self.codec_args()
+            cmd = [
+                self.ffmpeg_path,
+                '-i', str(video_path_abs),
+                *STREAM_SELECT_ARGS,
+                *codec_args,
+                '-ar', str(self.config.audio_sample_rate),  # 采样率
+                '-ac', '1',  # 单声道
+                '-f', 'segment',
+                '-segment_times', ','.join(f'{t:.3f}' for t in split_points),
+                '-reset_timestamps', '1',
+                '-y',  # 覆盖输出文件
+                '-loglevel', 'error',  # 只显示错误
+                str(self.temp_dir.absolute() / f"{chunk_id}_%03d{suffix}")
+            ]
+            
+            result = subprocess.run(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                timeout=300
+            )
+            
+            if result.returncode != 0:
+                raise RuntimeError(f"音频分段失败: {result.stderr}")
+            
+            # 按文件名前缀扫描临时目录，分段序号定宽，按名称排序即时间顺序
+            prefix = f"{chunk_id}_"
+            with os.scandir(self.temp_dir) as entries:
+                chunk_paths = sorted(
+                    entry.path for entry in entries
+                    if entry.name.startswith(prefix) and entry.name.endswith(suffix)
+                )
+            
+            if not chunk_paths:
+                raise RuntimeError("音频分段完成但未找到文件")
+            
+            if self.config.debug:
+                print(f"[AudioExtractor] 分段完成，共{len(chunk_paths)}段", file=sys.stderr)
+            
+            return chunk_paths
+            
+        except subprocess.TimeoutExpired:
+            raise RuntimeError("音频分段超时（300秒）")
+        except FileNotFoundError:
+            raise RuntimeError(f"未找到FFmpeg: {self.ffmpeg_path}")
+        except Exception as e:
+            raise RuntimeError(f"音频分段失败: {str(e)}")
+    
+    def _detect_silences(self, video_path_abs):
+        """检测静音段，返回各静音段的中点（秒）"""
+        cmd = [
+            self.ffmpeg_path,
+            '-hide_banner',
+            '-nostats',
+            '-i', str(video_path_abs),
+            '-vn',
+            '-af', 'silencedetect=noise=-35dB:d=0.5',
+            '-f', 'null',
+            '-'
+        ]
+        
+        try:
+            result = subprocess.run(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                timeout=300
+            )
+        except subprocess.TimeoutExpired:
+            return []
+        
+        # [silencedetect @ 0x...] silence_start: 12.34
+        # [silencedetect @ 0x...] silence_end: 13.56 | silence_duration: 1.22
+        midpoints = []
+        start = None
+        for line in result.stderr.split('\n'):
+            if 'silence_start:' in line:
+                start = float(line.split('silence_start:')[1].strip())
+            elif 'silence_end:' in line and start is not None:
+                end = float(line.split('silence_end:')[1].split('|')[0].strip())
+                midpoints.append((start + end) / 2)
+                start = None
+        
+        return midpoints
+    
+    @staticmethod
+    def _calculate_split_points(duration, chunk_sec, silences):
+        """在每个目标切分点附近（分段时长的10%以内）选取最近的静音中点"""
+        window = chunk_sec * 0.1
+        split_points = []
+        target = chunk_sec
+        
+        # 末尾不足一个窗口的部分并入最后一段
+        while target < duration - window:
+            nearby = [t for t in silences if abs(t - target) <= window]
+            point = min(nearby, key=lambda t: abs(t - target)) if nearby else target
+            
+            if not split_points or point > split_points[-1]:
+                split_points.append(point)
+            
+            target = point + chunk_sec
+        
+        return split_points
+    
+    def extract_stream(self, video_path):
+        """
+        以流的方式提取音频（Ogg/Opus，不落盘）
+        
+        Args:
+            video_path: 视频文件路径
+        
+        Returns:
+            subprocess.Popen: FFmpeg进程，音频数据从其stdout读取
+        """
+        try:
+            if self.config.debug:
+                print(f"[AudioExtractor] 流式提取音频: {video_path}", file=sys.stderr)
+            
+            cmd = [
+                self.ffmpeg_path,
+                '-i', str(Path(video_path).absolute()),
+                *STREAM_SELECT_ARGS,
+                *self.filter_args(),
+                *OPUS_CODEC_ARGS,
+                '-ar', str(self.config.audio_sample_rate),  # 采样率
+                '-ac', '1',  # 单声道
+                '-loglevel', 'error',  # 只显示错误
+                '-f', 'ogg',
+                'pipe:1'
+            ]
+            
+            if self.config.debug:
+                print(f"[AudioExtractor] FFmpeg命令: {' '.join(cmd)}", file=sys.stderr)
+            
+            process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+            
+        except FileNotFoundError:
+            raise RuntimeError(f"未找到FFmpeg: {self.ffmpeg_path}")
+        
+        # 后台线程持续读取stderr，避免错误输出填满管道后FFmpeg阻塞、stdout永不结束
+        process.stderr_lines = deque(maxlen=64)
+        process.stderr_reader = threading.Thread(
+            target=self._drain, args=(process.stderr, process.stderr_lines), daemon=True
+        )
+        process.stderr_reader.start()
+        
+        return process
+    
+    @staticmethod
+    def _drain(stream, lines):
+        """逐行读取FFmpeg错误输出，只保留最后若干行"""
+        with stream:
+            for line in stream:
+                if line.strip():
+                    lines.append(line.decode('utf-8', errors='replace').rstrip('\n'))
+    
+    def finish_stream(self, process):
+        """
+        等待流式提取结束并检查FFmpeg退出状态
+        
+        Args:
+            process: extract_stream返回的FFmpeg进程
+        """
+        process.stdout.close()
+        
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            raise RuntimeError("音频提取超时")
+        
+        process.stderr_reader.join(timeout=5)
+        
+        if process.returncode != 0:
+            stderr = '\n'.join(process.stderr_lines)
+            raise RuntimeError(f"音频提取失败: {stderr}")
+        
+        if self.config.debug:
+            print(f"[AudioExtractor] 流式提取完成", file=sys.stderr)
+    
+    def abort_stream(self, process):
+        """
+        上传失败时结束流式提取；FFmpeg自身出错退出时抛出其错误输出
+        
+        Args:
+            process: extract_stream返回的FFmpeg进程
+        """
+        try:
+            process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            return
+        
+        self.finish_stream(process)
 
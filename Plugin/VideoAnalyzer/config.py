@@ -0,0 +1,188 @@
+"""
+配置模块
+加载env文件并从环境变量解析插件配置，进程内只解析一次
+"""
+
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+
+# 转为绝对路径，temp_dir/output_dir下生成的路径可直接传给FFmpeg
+plugin_dir = Path(__file__).absolute().parent
+
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    """插件配置（只读）"""
+
+    whisper_api_key: Optional[str]
+    whisper_api_url: Optional[str]
+    whisper_model: str
+    whisper_language: str
+    whisper_backend: str
+    whisper_local_model: str
+    whisper_device: str
+    ai_api_key: Optional[str]
+    ai_api_url: Optional[str]
+    ai_model: str
+    ai_max_tokens: int
+    ffmpeg_path: str
+    ffprobe_path: Optional[str]
+    temp_dir: Path
+    output_dir: Path
+    max_video_duration: int
+    audio_sample_rate: int
+    stream_audio: bool
+    vad_trim: bool
+    transcribe_chunk_seconds: int
+    max_transcribe_concurrency: int
+    ytdlp_format: str
+    download_timeout: int
+    ytdlp_in_process: bool
+    use_shm: bool
+    enable_screenshots: bool
+    screenshot_interval: int
+    max_screenshots: int
+    screenshot_mode: str
+    screenshot_keyframes_only: bool
+    use_hwaccel: bool
+    single_pass_extract: bool
+    debug: bool
+    keep_temp_files: bool
+    enable_cache: bool
+    cache_ttl: int
+
+
+_CONFIG: Optional[Config] = None
+
+_ENV_LINE = re.compile(r'(?:export\s+)?([A-Za-z_][A-Za-z0-9_.-]*)\s*=\s*(.*)')
+_DOUBLE_QUOTED = re.compile(r'"((?:\\.|[^"\\])*)"\s*(?:#.*)?')
+_SINGLE_QUOTED = re.compile(r"'([^'\\]*)'\s*(?:#.*)?")
+_INLINE_COMMENT = re.compile(r'\s+#.*')
+_ESCAPE = re.compile(r'\\([\\\'"abfnrtv])')
+_ESCAPES = {
+    '\\': '\\', "'": "'", '"': '"',
+    'a': '\a', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v'
+}
+
+
+def load_env_file(path):
+    """
+    加载env文件到环境变量（不覆盖已存在的变量）
+
+    只含 KEY=VALUE 行的文件直接解析，省去导入python-dotenv；
+    含变量引用、多行值等语法时交给python-dotenv处理。
+
+    Args:
+        path: env文件路径
+    """
+    if not path.exists():
+        return
+
+    values = _parse_env_file(path)
+
+    if values is None:
+        from dotenv import load_dotenv
+        load_dotenv(path)
+        return
+
+    for key, value in values.items():
+        os.environ.setdefault(key, value)
+
+
+def _parse_env_file(path):
+    """解析简单的env文件，遇到无法识别的语法时返回None"""
+    values = {}
+
+    for line in path.read_text(encoding='utf-8-sig').splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        match = _ENV_LINE.fullmatch(line)
+        if match is None or '${' in line:
+            return None
+
+        key, raw = match.groups()
+
+        if raw.startswith('"'):
+            quoted = _DOUBLE_QUOTED.fullmatch(raw)
+            if quoted is None:
+                return None
+            value = _ESCAPE.sub(lambda m: _ESCAPES[m.group(1)], quoted.group(1))
+        elif raw.startswith("'"):
+            quoted = _SINGLE_QUOTED.fullmatch(raw)
+            if quoted is None:
+                return None
+            value = quoted.group(1)
+        else:
+            value = _INLINE_COMMENT.sub('', raw).rstrip()
+
+        values[key] = value
+
+    return values
+
+
+def get_config() -> Config:
+    """
+    获取插件配置（首次调用时从环境变量解析并缓存）
+
+    调用前需已加载 config.env 到环境变量。
+
+    Returns:
+        Config: 插件配置
+    """
+    global _CONFIG
+    if _CONFIG is None:
+        _CONFIG = _parse_env()
+    return _CONFIG
+
+
+def _env_bool(name, default):
+    """读取布尔型环境变量"""
+    return os.getenv(name, default).lower() == 'true'
+
+
+def _parse_env() -> Config:
+    """从环境变量解析配置"""
+    return Config(
+        whisper_api_key=os.getenv('WHISPER_API_KEY') or os.getenv('API_Key'),
+        whisper_api_url=os.getenv('WHISPER_API_URL') or os.getenv('API_URL'),
+        whisper_model=os.getenv('WHISPER_MODEL', 'whisper-1'),
+        whisper_language=os.getenv('WHISPER_LANGUAGE', 'auto'),
+        whisper_backend=os.getenv('WHISPER_BACKEND', 'api').lower(),
+        whisper_local_model=os.getenv('WHISPER_LOCAL_MODEL', 'small'),
+        whisper_device=os.getenv('WHISPER_DEVICE', 'cpu'),
+        ai_api_key=os.getenv('AI_API_KEY') or os.getenv('API_Key'),
+        ai_api_url=os.getenv('AI_API_URL') or os.getenv('API_URL'),
+        ai_model=os.getenv('AI_MODEL', 'gpt-4o-mini'),
+        ai_max_tokens=int(os.getenv('AI_MAX_TOKENS', '4000')),
+        ffmpeg_path=os.getenv('FFMPEG_PATH', 'ffmpeg'),
+        ffprobe_path=os.getenv('FFPROBE_PATH'),
+        temp_dir=plugin_dir / os.getenv('TEMP_DIR', './temp'),
+        output_dir=plugin_dir / os.getenv('OUTPUT_DIR', './output'),
+        max_video_duration=int(os.getenv('MAX_VIDEO_DURATION', '3600')),
+        audio_sample_rate=int(os.getenv('AUDIO_SAMPLE_RATE', '16000')),
+        stream_audio=_env_bool('STREAM_AUDIO', 'true'),
+        vad_trim=_env_bool('VAD_TRIM', 'true'),
+        transcribe_chunk_seconds=int(os.getenv('TRANSCRIBE_CHUNK_SECONDS', '600')),
+        max_transcribe_concurrency=int(os.getenv('MAX_TRANSCRIBE_CONCURRENCY', '4')),
+        ytdlp_format=os.getenv('YTDLP_FORMAT', 'bestaudio/best'),
+        download_timeout=int(os.getenv('DOWNLOAD_TIMEOUT', '300')),
+        ytdlp_in_process=_env_bool('YTDLP_IN_PROCESS', 'true'),
+        use_shm=_env_bool('USE_SHM', 'false'),
+        enable_screenshots=_env_bool('ENABLE_SCREENSHOTS', 'true'),
+        screenshot_interval=int(os.getenv('SCREENSHOT_INTERVAL', '30')),
+        max_screenshots=int(os.getenv('MAX_SCREENSHOTS', '10')),
+        screenshot_mode=os.getenv('SCREENSHOT_MODE', 'interval').lower(),
+        screenshot_keyframes_only=_env_bool('SCREENSHOT_KEYFRAMES_ONLY', 'true'),
+        use_hwaccel=_env_bool('USE_HWACCEL', 'false'),
+        single_pass_extract=_env_bool('SINGLE_PASS_EXTRACT', 'false'),
+        debug=_env_bool('DEBUG', 'false'),
+        keep_temp_files=_env_bool('KEEP_TEMP_FILES', 'false'),
+        enable_cache=_env_bool('ENABLE_CACHE', 'false'),
+        cache_ttl=int(os.getenv('CACHE_TTL', '604800'))
+    )
@@ -0,0 +1,66 @@
+"""
+HTTP会话模块
+按主机共享requests.Session，复用连接并自动重试
+"""
+
+import threading
+from urllib.parse import urlsplit
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(url, config, retries=True):
+    """
+    获取URL所在主机共享的Session
+    
+    Whisper与AI接口位于同一主机时共用一个连接池，省去重复的TLS握手。
+    
+    Args:
+        url: API地址
+        config: 插件配置（连接池按最大并发转录数设定大小）
+        retries: 是否按状态码自动重试；请求体无法回绕（如流式上传）时应为False，
+            否则遇到429/5xx时urllib3无法重发请求，状态码和响应内容随之丢失
+    
+    Returns:
+        requests.Session: 共享会话
+    """
+    parts = urlsplit(url)
+    key = (parts.scheme, parts.netloc, retries)
+    
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _create_session(config, retries)
+            _sessions[key] = session
+    
+    return session
+
+
+def _create_session(config, retries):
+    """创建带连接池和重试策略的Session"""
+    # 首次发起请求时才导入requests，仅下载的调用无需承担其导入开销
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    
+    if retries:
+        max_retries = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset(['GET', 'POST']),
+            raise_on_status=False  # 重试耗尽后返回最后的响应，由调用方报告状态码
+        )
+    else:
+        max_retries = 0
+    
+    # 并发转录的各分段同时占用连接，连接池不小于最大并发数，避免连接反复建立
+    pool_maxsize = max(4, config.max_transcribe_concurrency)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=max_retries)
+    
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
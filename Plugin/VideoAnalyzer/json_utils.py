@@ -0,0 +1,31 @@
+"""
+JSON编码模块
+优先使用orjson（C扩展），未安装时回退到标准库json
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj, indent=False):
+    """
+    将对象编码为UTF-8 JSON字节串
+    
+    Args:
+        obj: 待编码对象
+        indent: 是否以2空格缩进
+    
+    Returns:
+        bytes: JSON字节串
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode('utf-8')
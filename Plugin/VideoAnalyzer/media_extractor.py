@@ -0,0 +1,108 @@
+"""
+音视频单次提取模块
+一次FFmpeg调用同时输出音频和截图，视频只解复用一遍
+"""
+
+import sys
+import os
+import subprocess
+from pathlib import Path
+from audio_extractor import AudioExtractor, STREAM_SELECT_ARGS
+from screenshot_extractor import ScreenshotExtractor
+
+
+class MediaExtractor:
+    """音视频单次提取器"""
+
+    def __init__(self, config):
+        self.config = config
+        self.ffmpeg_path = config.ffmpeg_path
+        self.temp_dir = config.temp_dir
+        self.output_dir = config.output_dir
+        self.audio_extractor = AudioExtractor(config)
+        self.screenshot_extractor = ScreenshotExtractor(config)
+
+    def extract_all(self, video_path, video_id, duration):
+        """
+        单次FFmpeg调用提取音频和截图，失败时回退为分别提取
+
+        Args:
+            video_path: 视频文件路径
+            video_id: 视频ID（用于命名截图文件）
+            duration: 视频时长（秒）
+
+        Returns:
+            tuple: (音频文件路径, 截图文件路径列表)
+        """
+        timestamps = self.screenshot_extractor.calculate_timestamps(video_path, duration)
+
+        if not timestamps:
+            return self.audio_extractor.extract(video_path), []
+
+        screenshot_dir = self.output_dir / video_id / 'screenshots'
+        screenshot_dir.mkdir(parents=True, exist_ok=True)
+
+        codec_args, suffix = self.audio_extractor.codec_args()
+        audio_path = self.temp_dir / f"{os.urandom(8).hex()}{suffix}"
+        video_abs = str(Path(video_path).absolute())
+
+        # 第一路输出音频，第二路输出截图，各自通过-map选取流
+        cmd = [
+            self.ffmpeg_path,
+            '-y',  # 覆盖输出文件
+            '-loglevel', 'error',  # 只显示错误
+            *self.screenshot_extractor.decode_args(),
+            '-i', video_abs,
+            *STREAM_SELECT_ARGS,
+            *self.audio_extractor.filter_args(),
+            *codec_args,
+            '-ar', str(self.config.audio_sample_rate),  # 采样率
+            '-ac', '1',  # 单声道
+            str(audio_path.absolute()),
+            '-map', '0:v:0',
+            *self.screenshot_extractor.frames_output_args(timestamps, screenshot_dir)
+        ]
+
+        if self.config.debug:
+            print(f"[MediaExtractor] 单次提取音频和截图: {video_path}", file=sys.stderr)
+            print(f"[MediaExtractor] FFmpeg命令: {' '.join(cmd)}", file=sys.stderr)
+
+        try:
+            result = subprocess.run(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                timeout=300
+            )
+
+            if result.returncode == 0 and audio_path.exists():
+                screenshots = self.screenshot_extractor.collect_screenshots(screenshot_dir)
+
+                # 只解码关键帧时同一GOP内的时间点会合并为一帧，数量不足时逐帧补齐
+                if len(screenshots) < len(timestamps):
+                    screenshots = self.screenshot_extractor.extract_each_frame(
+                        video_abs, timestamps, screenshot_dir
+                    )
+
+                if self.config.debug:
+                    print(f"[MediaExtractor] 提取完成，共{len(screenshots)}张截图", file=sys.stderr)
+
+                return str(audio_path), screenshots
+
+            if self.config.debug:
+                print(f"[MediaExtractor] 单次提取失败，回退为分别提取: {result.stderr}", file=sys.stderr)
+
+        except subprocess.TimeoutExpired:
+            if self.config.debug:
+                print(f"[MediaExtractor] 单次提取超时，回退为分别提取", file=sys.stderr)
+        except FileNotFoundError:
+            raise RuntimeError(f"未找到FFmpeg: {self.ffmpeg_path}")
+
+        if audio_path.exists():
+            audio_path.unlink()
+
+        return (
+            self.audio_extractor.extract(video_path),
+            self.screenshot_extractor.extract(video_path, video_id)
+        )
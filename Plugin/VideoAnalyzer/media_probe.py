@@ -0,0 +1,95 @@
+"""
+媒体信息模块
+使用ffprobe获取媒体时长等信息
+"""
+
+import sys
+import json
+import subprocess
+from pathlib import Path
+
+
+class MediaProbe:
+    """媒体信息探测器"""
+    
+    def __init__(self, config):
+        self.config = config
+        self.ffmpeg_path = config.ffmpeg_path
+        self.ffprobe_path = config.ffprobe_path or self._default_ffprobe_path(self.ffmpeg_path)
+    
+    @staticmethod
+    def _default_ffprobe_path(ffmpeg_path):
+        """根据FFmpeg路径推断同目录下的ffprobe，无法推断时返回None"""
+        ffmpeg = Path(ffmpeg_path)
+        if 'ffmpeg' not in ffmpeg.name:
+            return None
+        return str(ffmpeg.with_name(ffmpeg.name.replace('ffmpeg', 'ffprobe')))
+    
+    def get_duration(self, video_path):
+        """
+        获取媒体时长
+        
+        Args:
+            video_path: 媒体文件路径
+        
+        Returns:
+            float: 时长（秒），失败返回0
+        """
+        video_path_abs = str(Path(video_path).absolute())
+        
+        if self.ffprobe_path is None:
+            return self._get_duration_ffmpeg(video_path_abs)
+        
+        try:
+            # ffprobe只读取容器头，不解码媒体数据
+            output = subprocess.check_output(
+                [
+                    self.ffprobe_path,
+                    '-v', 'error',
+                    '-print_format', 'json',
+                    '-show_format',
+                    video_path_abs
+                ],
+                timeout=10
+            )
+            return float(json.loads(output)['format']['duration'])
+            
+        except Exception as e:
+            # 未安装ffprobe、执行失败或输出中缺少时长时，回退到解析FFmpeg输出
+            if self.config.debug:
+                print(f"[MediaProbe] ffprobe获取时长失败，回退到FFmpeg: {str(e)}", file=sys.stderr)
+            return self._get_duration_ffmpeg(video_path_abs)
+    
+    def _get_duration_ffmpeg(self, video_path_abs):
+        """从FFmpeg的输入信息中解析时长（秒），失败返回0"""
+        try:
+            # 不指定输出时FFmpeg只打印输入信息后退出，不会解码整个文件
+            cmd = [
+                self.ffmpeg_path,
+                '-hide_banner',
+                '-i', video_path_abs
+            ]
+            
+            result = subprocess.run(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                timeout=30
+            )
+            
+            # 从stderr中解析时长
+            for line in result.stderr.split('\n'):
+                if 'Duration:' in line:
+                    # Duration: 00:04:12.44, start: 0.000000, bitrate: 657 kb/s
+                    duration_str = line.split('Duration:')[1].split(',')[0].strip()
+                    h, m, s = duration_str.split(':')
+                    duration = int(h) * 3600 + int(m) * 60 + float(s)
+                    return duration
+            
+            return 0
+            
+        except Exception as e:
+            if self.config.debug:
+                print(f"[MediaProbe] 获取时长失败: {str(e)}", file=sys.stderr)
+            return 0
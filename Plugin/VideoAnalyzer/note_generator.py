@@ -4,8 +4,61 @@
 """
 
 import sys
-import requests
 import json
+from functools import lru_cache
+from http_client import get_session
+from response_cache import get_cache, cache_expire, text_digest
+
+
+# 各风格的提示词前缀，转录文本直接拼接在末尾
+_PROMPT_PREFIXES = {
+    'academic': """请基于以下视频转录文本，生成学术风格的笔记。要求：
+1. 使用正式的学术语言
+2. 提取关键概念和理论
+3. 组织成清晰的层次结构
+4. 包含重要的论据和证据
+5. 使用Markdown格式
+
+转录文本：
+""",
+    
+    'casual': """请基于以下视频转录文本，生成口语化的笔记。要求：
+1. 使用轻松易懂的语言
+2. 提取核心要点
+3. 保持简洁明了
+4. 使用Markdown格式
+
+转录文本：
+""",
+    
+    'detailed': """请基于以下视频转录文本，生成详细的笔记。要求：
+1. 完整记录所有重要信息
+2. 保留细节和例子
+3. 组织成清晰的结构
+4. 使用Markdown格式，包含标题、列表等
+
+转录文本：
+""",
+    
+    'brief': """请基于以下视频转录文本，生成简要笔记。要求：
+1. 提取核心要点
+2. 简洁明了
+3. 使用Markdown格式
+
+转录文本：
+"""
+}
+
+_SUMMARY_PREFIX = """请基于以下视频转录文本，生成简短的摘要（200字以内）。
+
+转录文本：
+"""
+
+
+@lru_cache(maxsize=32)
+def _split_custom_prompt(custom_prompt):
+    """按{transcript}占位符切分自定义提示词"""
+    return tuple(custom_prompt.split('{transcript}'))
 
 
 class NoteGenerator:
@@ -13,16 +66,23 @@ class NoteGenerator:
     
     def __init__(self, config):
         self.config = config
-        self.api_key = config['ai_api_key']
-        self.api_url = config['ai_api_url']
-        self.model = config['ai_model']
-        self.max_tokens = config['ai_max_tokens']
+        self.api_key = config.ai_api_key
+        self.api_url = config.ai_api_url
+        self.model = config.ai_model
+        self.max_tokens = config.ai_max_tokens
         
         if not self.api_key:
             raise ValueError("未配置AI API Key")
         
         if not self.api_url:
             raise ValueError("未配置AI API URL")
+        
+        self.cache = get_cache(config)
+    
+    @property
+    def session(self):
+        """AI API所在主机的共享会话（首次请求时创建）"""
+        return get_session(self.api_url, self.config)
     
     def generate_notes(self, transcript, style='brief', custom_prompt=None):
         """
@@ -38,49 +98,11 @@ class NoteGenerator:
         """
         # 如果使用自定义提示词
         if style == 'custom' and custom_prompt:
-            prompt = custom_prompt.format(transcript=transcript)
+            prompt = transcript.join(_split_custom_prompt(custom_prompt))
             return self._call_ai(prompt)
 
         # 根据风格选择提示词
-        prompts = {
-            'academic': """请基于以下视频转录文本，生成学术风格的笔记。要求：
-1. 使用正式的学术语言
-2. 提取关键概念和理论
-3. 组织成清晰的层次结构
-4. 包含重要的论据和证据
-5. 使用Markdown格式
-
-转录文本：
-{transcript}""",
-            
-            'casual': """请基于以下视频转录文本，生成口语化的笔记。要求：
-1. 使用轻松易懂的语言
-2. 提取核心要点
-3. 保持简洁明了
-4. 使用Markdown格式
-
-转录文本：
-{transcript}""",
-            
-            'detailed': """请基于以下视频转录文本，生成详细的笔记。要求：
-1. 完整记录所有重要信息
-2. 保留细节和例子
-3. 组织成清晰的结构
-4. 使用Markdown格式，包含标题、列表等
-
-转录文本：
-{transcript}""",
-            
-            'brief': """请基于以下视频转录文本，生成简要笔记。要求：
-1. 提取核心要点
-2. 简洁明了
-3. 使用Markdown格式
-
-转录文本：
-{transcript}"""
-        }
-        
-        prompt = prompts.get(style, prompts['brief']).format(transcript=transcript)
+        prompt = _PROMPT_PREFIXES.get(style, _PROMPT_PREFIXES['brief']) + transcript
         
         return self._call_ai(prompt)
     
@@ -94,10 +116,7 @@ class NoteGenerator:
         Returns:
             str: 视频摘要
         """
-        prompt = f"""请基于以下视频转录文本，生成简短的摘要（200字以内）。
-
-转录文本：
-{transcript}"""
+        prompt = _SUMMARY_PREFIX + transcript
         
         return self._call_ai(prompt)
     
@@ -111,8 +130,20 @@ class NoteGenerator:
         Returns:
             str: AI响应
         """
+        cache_key = None
+        if self.cache is not None:
+            cache_key = f"ai:{text_digest(self.api_url, self.model, self.max_tokens, prompt)}"
+            
+            content = self.cache.get(cache_key)
+            if content is not None:
+                if self.config.debug:
+                    print(f"[NoteGenerator] 命中缓存", file=sys.stderr)
+                return content
+        
+        import requests
+        
         try:
-            if self.config['debug']:
+            if self.config.debug:
                 print(f"[NoteGenerator] 调用AI API...", file=sys.stderr)
             
             # 构建API URL
@@ -139,7 +170,7 @@ class NoteGenerator:
             }
             
             # 发送请求
-            response = requests.post(
+            response = self.session.post(
                 api_url,
                 headers=headers,
                 json=data,
@@ -158,9 +189,12 @@ class NoteGenerator:
             
             content = result['choices'][0]['message']['content']
             
-            if self.config['debug']:
+            if self.config.debug:
                 print(f"[NoteGenerator] AI响应完成，长度: {len(content)}", file=sys.stderr)
             
+            if cache_key is not None:
+                self.cache.set(cache_key, content, expire=cache_expire(self.config))
+            
             return content
             
         except requests.exceptions.Timeout:
@@ -0,0 +1,73 @@
+"""
+响应缓存模块
+按内容哈希缓存Whisper转录和AI生成结果，重复分析同一视频时跳过API调用
+"""
+
+import hashlib
+import os
+import threading
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+
+# 计算文件哈希时每次读取的字节数
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(config):
+    """
+    获取响应缓存
+    
+    Args:
+        config: 插件配置
+    
+    Returns:
+        diskcache.Cache: 缓存对象；未启用或未安装diskcache时返回None
+    """
+    if not config.enable_cache or diskcache is None:
+        return None
+    
+    cache_dir = str(config.temp_dir / 'cache')
+    
+    with _caches_lock:
+        cache = _caches.get(cache_dir)
+        if cache is None:
+            cache = diskcache.Cache(cache_dir)
+            _caches[cache_dir] = cache
+    
+    return cache
+
+
+def cache_expire(config):
+    """缓存有效期（秒），0表示永不过期"""
+    return config.cache_ttl or None
+
+
+def file_digest(path):
+    """分块计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_signature(path):
+    """按绝对路径、大小和修改时间标识文件，不读取文件内容"""
+    st = os.stat(path)
+    return text_digest(os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+
+def text_digest(*parts):
+    """计算多段文本的SHA-256"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
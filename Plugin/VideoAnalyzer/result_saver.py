@@ -4,9 +4,13 @@
 """
 
 import sys
-import json
-from pathlib import Path
+import os
 from datetime import datetime
+from json_utils import dumps
+
+
+# 写文件缓冲区大小，减少大段转录文本的写入次数
+WRITE_BUFFER_SIZE = 1024 * 1024
 
 
 class ResultSaver:
@@ -14,7 +18,7 @@ class ResultSaver:
     
     def __init__(self, config):
         self.config = config
-        self.output_dir = config['output_dir']
+        self.output_dir = config.output_dir
     
     def save(self, result, video_id, screenshots=None):
         """
@@ -38,76 +42,81 @@ class ResultSaver:
             # 保存转录文本
             if 'transcript' in result:
                 transcript_path = video_output_dir / 'transcript.txt'
-                with open(transcript_path, 'w', encoding='utf-8') as f:
+                with open(transcript_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
                     f.write(result['transcript'])
                 saved_files['transcript'] = str(transcript_path)
                 
-                if self.config['debug']:
+                if self.config.debug:
                     print(f"[ResultSaver] 转录文本已保存: {transcript_path}", file=sys.stderr)
             
             # 保存笔记（Markdown格式）
             if 'content' in result:
                 notes_path = video_output_dir / 'notes.md'
                 
-                # 生成Markdown内容
-                markdown_content = self._generate_markdown(result, screenshots)
-                
-                with open(notes_path, 'w', encoding='utf-8') as f:
-                    f.write(markdown_content)
+                # 逐段写入Markdown内容
+                with open(notes_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+                    self._write_markdown(f, result, screenshots)
                 saved_files['notes'] = str(notes_path)
                 
-                if self.config['debug']:
+                if self.config.debug:
                     print(f"[ResultSaver] 笔记已保存: {notes_path}", file=sys.stderr)
             
-            # 保存JSON结果
+            # 保存JSON结果，转录文本已单独保存时只记录其路径
+            json_result = dict(result)
+            if 'transcript' in saved_files:
+                json_result.pop('transcript', None)
+                json_result['transcript_path'] = saved_files['transcript']
+            
             json_path = video_output_dir / 'result.json'
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(result, f, ensure_ascii=False, indent=2)
+            with open(json_path, 'wb') as f:
+                f.write(dumps(json_result))
             saved_files['json'] = str(json_path)
             
-            if self.config['debug']:
+            if self.config.debug:
                 print(f"[ResultSaver] JSON结果已保存: {json_path}", file=sys.stderr)
             
             return saved_files
             
         except Exception as e:
-            if self.config['debug']:
+            if self.config.debug:
                 print(f"[ResultSaver] 保存失败: {str(e)}", file=sys.stderr)
             return {}
     
-    def _generate_markdown(self, result, screenshots=None):
-        """生成Markdown内容"""
-        lines = []
-        
+    def _write_markdown(self, f, result, screenshots=None):
+        """将Markdown内容逐段写入文件"""
         # 标题
-        lines.append(f"# 视频分析笔记\n")
+        f.write("# 视频分析笔记\n\n")
         
         # 元信息
-        lines.append(f"## 基本信息\n")
-        lines.append(f"- **视频URL**: {result.get('url', 'N/A')}")
-        lines.append(f"- **分析模式**: {result.get('mode', 'N/A')}")
-        lines.append(f"- **分析时间**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        lines.append(f"\n---\n")
+        f.write("## 基本信息\n\n")
+        f.write(f"- **视频URL**: {result.get('url', 'N/A')}\n")
+        f.write(f"- **分析模式**: {result.get('mode', 'N/A')}\n")
+        f.write(f"- **分析时间**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write("\n---\n\n")
         
         # 截图（如果有）
         if screenshots and len(screenshots) > 0:
-            lines.append(f"## 视频截图\n")
+            f.write("## 视频截图\n\n")
+            # 使用相对路径：公共前缀只计算一次，逐张截图做字符串切片
+            base_dir = str(self.output_dir.parent)
+            prefix = base_dir + os.sep
             for i, screenshot in enumerate(screenshots):
-                # 使用相对路径
-                rel_path = Path(screenshot).relative_to(self.output_dir.parent)
-                lines.append(f"### 截图 {i+1}\n")
-                lines.append(f"![截图{i+1}]({rel_path})\n")
-            lines.append(f"\n---\n")
+                if screenshot.startswith(prefix):
+                    rel_path = screenshot.removeprefix(prefix)
+                else:
+                    rel_path = os.path.relpath(screenshot, base_dir)
+                f.write(f"### 截图 {i+1}\n\n")
+                f.write(f"![截图{i+1}]({rel_path})\n\n")
+            f.write("\n---\n\n")
         
         # 主要内容
-        lines.append(f"## 分析内容\n")
-        lines.append(result.get('content', ''))
+        f.write("## 分析内容\n\n")
+        f.write(result.get('content', ''))
         
         # 转录文本（如果与content不同）
         if 'transcript' in result and result['transcript'] != result.get('content'):
-            lines.append(f"\n---\n")
-            lines.append(f"## 完整转录\n")
-            lines.append(f"```\n{result['transcript']}\n```")
-        
-        return '\n'.join(lines)
-
+            f.write("\n\n---\n\n")
+            f.write("## 完整转录\n\n")
+            f.write("```\n")
+            f.write(result['transcript'])
+            f.write("\n```")
@@ -0,0 +1,148 @@
+"""
+场景检测模块
+根据画面变化幅度选取截图时间点
+"""
+
+import sys
+import subprocess
+from pathlib import Path
+
+# 采样帧率与缩略图尺寸：只需粗略的画面差异
+SAMPLE_FPS = 2
+FRAME_WIDTH = 64
+FRAME_HEIGHT = 36
+
+
+# numpy/numba在首次场景检测时导入，默认的均匀截图模式无需承担其导入和编译开销
+np = None
+_pick_peaks_impl = None
+
+
+def _load_numeric():
+    """导入numpy并编译峰值选取函数（numba可选），未安装numpy时返回False"""
+    global np, _pick_peaks_impl
+    
+    if _pick_peaks_impl is not None:
+        return True
+    
+    try:
+        import numpy as np
+    except ImportError:
+        return False
+    
+    try:
+        from numba import njit
+        _pick_peaks_impl = njit(cache=True)(pick_peaks)
+    except Exception:
+        # 未安装numba或无法写入编译缓存时以纯Python执行
+        _pick_peaks_impl = pick_peaks
+    
+    return True
+
+
+def pick_peaks(scores, k, min_gap):
+    """
+    贪心选取得分最高的k个位置，相邻位置间隔不小于min_gap
+    
+    Args:
+        scores: 每个采样帧的画面变化得分
+        k: 最多选取的数量
+        min_gap: 最小间隔（采样帧数）
+    
+    Returns:
+        按位置升序排列的索引数组
+    """
+    order = np.argsort(scores)[::-1]
+    picked = np.empty(k, dtype=np.int64)
+    count = 0
+    
+    for idx in order:
+        if count >= k:
+            break
+        
+        keep = True
+        for j in range(count):
+            if abs(idx - picked[j]) < min_gap:
+                keep = False
+                break
+        
+        if keep:
+            picked[count] = idx
+            count += 1
+    
+    return np.sort(picked[:count])
+
+
+class SceneDetector:
+    """场景检测器"""
+    
+    def __init__(self, config):
+        self.config = config
+        self.ffmpeg_path = config.ffmpeg_path
+        self.hwaccel_args = ['-hwaccel', 'auto'] if config.use_hwaccel else []
+    
+    @staticmethod
+    def is_available():
+        """是否已安装numpy（首次调用时导入）"""
+        return _load_numeric()
+    
+    def detect(self, video_path, count, min_gap_seconds):
+        """
+        检测画面变化最大的时间点
+        
+        Args:
+            video_path: 视频文件路径
+            count: 需要的时间点数量
+            min_gap_seconds: 时间点之间的最小间隔（秒）
+        
+        Returns:
+            list: 按时间排序的时间点（秒），失败返回空列表
+        """
+        if not self.is_available() or count <= 0:
+            return []
+        
+        try:
+            scores = self._frame_diff_scores(video_path)
+            
+            if len(scores) == 0:
+                return []
+            
+            min_gap = max(1, int(min_gap_seconds * SAMPLE_FPS))
+            peaks = _pick_peaks_impl(scores, count, min_gap)
+            
+            # scores[i]对应第i+1个采样帧与前一帧的差异
+            return [float(idx + 1) / SAMPLE_FPS for idx in peaks]
+            
+        except Exception as e:
+            if self.config.debug:
+                print(f"[SceneDetector] 场景检测失败: {str(e)}", file=sys.stderr)
+            return []
+    
+    def _frame_diff_scores(self, video_path):
+        """以低帧率解码灰度缩略图，计算相邻帧的绝对差之和"""
+        cmd = [
+            self.ffmpeg_path,
+            *self.hwaccel_args,
+            '-i', str(Path(video_path).absolute()),
+            '-an',
+            '-vf', f'fps={SAMPLE_FPS},scale={FRAME_WIDTH}:{FRAME_HEIGHT},format=gray',
+            '-f', 'rawvideo',
+            '-loglevel', 'error',
+            'pipe:1'
+        ]
+        
+        result = subprocess.run(
+            cmd,
+            capture_output=True,
+            timeout=300
+        )
+        
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.decode('utf-8', errors='replace'))
+        
+        frame_size = FRAME_WIDTH * FRAME_HEIGHT
+        frame_count = len(result.stdout) // frame_size
+        frames = np.frombuffer(result.stdout, dtype=np.uint8, count=frame_count * frame_size)
+        frames = frames.reshape(frame_count, frame_size).astype(np.int16)
+        
+        return np.abs(np.diff(frames, axis=0)).sum(axis=1).astype(np.float64)
@@ -4,9 +4,12 @@
 """
 
 import sys
+import os
+import asyncio
 import subprocess
 from pathlib import Path
-import uuid
+from media_probe import MediaProbe
+from scene_detector import SceneDetector
 
 
 class ScreenshotExtractor:
@@ -14,11 +17,17 @@ class ScreenshotExtractor:
     
     def __init__(self, config):
         self.config = config
-        self.output_dir = config['output_dir']
-        self.ffmpeg_path = config['ffmpeg_path']
-        self.enable_screenshots = config['enable_screenshots']
-        self.screenshot_interval = config['screenshot_interval']
-        self.max_screenshots = config['max_screenshots']
+        self.output_dir = config.output_dir
+        self.ffmpeg_path = config.ffmpeg_path
+        self.enable_screenshots = config.enable_screenshots
+        self.screenshot_interval = config.screenshot_interval
+        self.max_screenshots = config.max_screenshots
+        self.screenshot_mode = config.screenshot_mode
+        self.keyframes_only = config.screenshot_keyframes_only
+        # 硬件解码：由FFmpeg自动选择可用的加速方式，解码后的帧拷回内存供滤镜和JPEG编码使用
+        self.hwaccel_args = ['-hwaccel', 'auto'] if config.use_hwaccel else []
+        self.probe = MediaProbe(config)
+        self.scene_detector = SceneDetector(config)
     
     def extract(self, video_path, video_id):
         """
@@ -39,72 +48,57 @@ class ScreenshotExtractor:
             screenshot_dir = self.output_dir / video_id / 'screenshots'
             screenshot_dir.mkdir(parents=True, exist_ok=True)
             
-            if self.config['debug']:
+            if self.config.debug:
                 print(f"[ScreenshotExtractor] 提取截图: {video_path}", file=sys.stderr)
             
             # 获取视频时长
-            duration = self._get_video_duration(video_path)
+            duration = self.probe.get_duration(video_path)
             
             if duration <= 0:
-                if self.config['debug']:
+                if self.config.debug:
                     print(f"[ScreenshotExtractor] 无法获取视频时长", file=sys.stderr)
                 return []
             
             # 计算截图时间点
-            timestamps = self._calculate_timestamps(duration)
+            timestamps = self.calculate_timestamps(video_path, duration)
             
-            # 提取截图
-            screenshots = []
-            for i, timestamp in enumerate(timestamps):
-                screenshot_path = screenshot_dir / f"screenshot_{i+1:03d}.jpg"
-                
-                if self._extract_frame(video_path, timestamp, screenshot_path):
-                    screenshots.append(str(screenshot_path))
+            if not timestamps:
+                return []
+            
+            # 绝对路径只计算一次，供各次FFmpeg调用复用
+            video_abs = str(Path(video_path).absolute())
+            
+            # 一次FFmpeg调用提取全部截图；失败或数量不足时（只解码关键帧时同一GOP内的
+            # 时间点会合并为一帧）回退到逐帧提取
+            screenshots = self._extract_frames(video_abs, timestamps, screenshot_dir)
+            
+            if len(screenshots) < len(timestamps):
+                screenshots = self.extract_each_frame(video_abs, timestamps, screenshot_dir)
             
-            if self.config['debug']:
+            if self.config.debug:
                 print(f"[ScreenshotExtractor] 提取完成，共{len(screenshots)}张截图", file=sys.stderr)
             
             return screenshots
             
         except Exception as e:
-            if self.config['debug']:
+            if self.config.debug:
                 print(f"[ScreenshotExtractor] 截图提取失败: {str(e)}", file=sys.stderr)
             return []
     
-    def _get_video_duration(self, video_path):
-        """获取视频时长（秒）"""
-        try:
-            cmd = [
-                self.ffmpeg_path,
-                '-i', str(Path(video_path).absolute()),
-                '-f', 'null',
-                '-'
-            ]
-            
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            
-            # 从stderr中解析时长
-            for line in result.stderr.split('\n'):
-                if 'Duration:' in line:
-                    # Duration: 00:04:12.44, start: 0.000000, bitrate: 657 kb/s
-                    duration_str = line.split('Duration:')[1].split(',')[0].strip()
-                    h, m, s = duration_str.split(':')
-                    duration = int(h) * 3600 + int(m) * 60 + float(s)
-                    return duration
-            
-            return 0
-            
-        except Exception as e:
-            if self.config['debug']:
-                print(f"[ScreenshotExtractor] 获取时长失败: {str(e)}", file=sys.stderr)
-            return 0
+    async def extract_async(self, video_path, video_id):
+        """
+        异步提取截图，在工作线程中执行extract，便于与音频处理并发
+        
+        Args:
+            video_path: 视频文件路径
+            video_id: 视频ID（用于命名截图文件）
+        
+        Returns:
+            list: 截图文件路径列表
+        """
+        return await asyncio.to_thread(self.extract, video_path, video_id)
     
-    def _calculate_timestamps(self, duration):
+    def calculate_timestamps(self, video_path, duration):
         """计算截图时间点"""
         # 根据间隔和最大数量计算时间点
         interval = self.screenshot_interval
@@ -119,6 +113,15 @@ class ScreenshotExtractor:
         if count <= 0:
             return []
         
+        # 场景模式：选取画面变化最大的时间点，失败时回退到均匀分布
+        if self.screenshot_mode == 'scene':
+            timestamps = self.scene_detector.detect(video_path, count, interval / 2)
+            if timestamps:
+                return timestamps
+            
+            if self.config.debug:
+                print(f"[ScreenshotExtractor] 场景检测不可用，使用均匀分布", file=sys.stderr)
+        
         # 均匀分布时间点
         timestamps = []
         step = duration / (count + 1)
@@ -128,35 +131,114 @@ class ScreenshotExtractor:
         
         return timestamps
     
-    def _extract_frame(self, video_path, timestamp, output_path):
-        """提取单帧"""
+    def _extract_frames(self, video_abs, timestamps, screenshot_dir):
+        """单次FFmpeg调用提取所有时间点的截图（video_abs为视频绝对路径字符串）"""
+        try:
+            cmd = [
+                self.ffmpeg_path,
+                '-y',
+                '-loglevel', 'error',
+                *self.decode_args(),
+                '-i', video_abs,
+                *self.frames_output_args(timestamps, screenshot_dir)
+            ]
+            
+            result = subprocess.run(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                timeout=300
+            )
+            
+            if result.returncode != 0:
+                if self.config.debug:
+                    print(f"[ScreenshotExtractor] 批量提取失败: {result.stderr}", file=sys.stderr)
+                return []
+            
+            return self.collect_screenshots(screenshot_dir)
+            
+        except Exception as e:
+            if self.config.debug:
+                print(f"[ScreenshotExtractor] 批量提取异常: {str(e)}", file=sys.stderr)
+            return []
+    
+    def decode_args(self):
+        """视频解码参数（位于-i之前）"""
+        # 只解码关键帧：跳过所有非关键帧的解码，截图取时间点之后最近的关键帧
+        decode_args = ['-skip_frame:v', 'nokey'] if self.keyframes_only else []
+        return [*self.hwaccel_args, *decode_args]
+    
+    def frames_output_args(self, timestamps, screenshot_dir):
+        """批量截图的输出参数（含输出文件名模板）"""
+        # 每个时间点选取第一个到达该时刻的帧
+        select_expr = '+'.join(
+            f'gte(t,{t:.3f})*lt(prev_pts*TB,{t:.3f})' for t in timestamps
+        )
+        
+        return [
+            '-vf', f"select='{select_expr}'",
+            '-vsync', 'vfr',
+            '-frames:v', str(len(timestamps)),
+            '-q:v', '2',
+            str(screenshot_dir / 'screenshot_%03d.jpg')
+        ]
+    
+    @staticmethod
+    def collect_screenshots(screenshot_dir):
+        """按文件名顺序收集批量提取的截图"""
+        with os.scandir(screenshot_dir) as entries:
+            return sorted(
+                entry.path for entry in entries
+                if entry.name.startswith('screenshot_') and entry.name.endswith('.jpg')
+            )
+    
+    def extract_each_frame(self, video_abs, timestamps, screenshot_dir):
+        """逐个时间点单独提取截图（video_abs为视频绝对路径字符串）"""
+        if self.config.debug:
+            print(f"[ScreenshotExtractor] 逐帧提取{len(timestamps)}张截图", file=sys.stderr)
+        
+        screenshots = []
+        for i, timestamp in enumerate(timestamps):
+            screenshot_path = screenshot_dir / f"screenshot_{i+1:03d}.jpg"
+            
+            if self._extract_frame(video_abs, timestamp, screenshot_path):
+                screenshots.append(str(screenshot_path))
+        
+        return screenshots
+    
+    def _extract_frame(self, video_abs, timestamp, output_path):
+        """提取单帧（video_abs为视频绝对路径字符串，output_path位于绝对路径的截图目录下）"""
         try:
             cmd = [
                 self.ffmpeg_path,
+                *self.hwaccel_args,
                 '-ss', str(timestamp),
-                '-i', str(Path(video_path).absolute()),
+                '-i', video_abs,
                 '-vframes', '1',
                 '-q:v', '2',
                 '-y',
-                str(Path(output_path).absolute())
+                '-loglevel', 'error',  # 只显示错误
+                str(output_path)
             ]
             
             result = subprocess.run(
                 cmd,
-                capture_output=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
                 text=True,
                 timeout=30
             )
             
             if result.returncode != 0:
-                if self.config['debug']:
+                if self.config.debug:
                     print(f"[ScreenshotExtractor] 提取帧失败: {result.stderr}", file=sys.stderr)
                 return False
             
-            return Path(output_path).exists()
+            return output_path.exists()
             
         except Exception as e:
-            if self.config['debug']:
+            if self.config.debug:
                 print(f"[ScreenshotExtractor] 提取帧异常: {str(e)}", file=sys.stderr)
             return False
 
@@ -4,18 +4,93 @@
 """
 
 import sys
-import requests
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from http_client import get_session
+from response_cache import get_cache, cache_expire, file_digest, file_signature
+
+
+class _StreamingBody:
+    """
+    流式请求体
+    
+    数据来自管道，无法回绕；tell()抛出OSError使urllib3在需要重试时直接报错，
+    而不是重发一个已耗尽的请求体。
+    """
+    
+    def __init__(self, chunks):
+        self._chunks = chunks
+    
+    def __iter__(self):
+        return self._chunks
+    
+    def tell(self):
+        raise OSError("流式请求体不支持回绕")
+
+
+class _FileMultipartBody:
+    """
+    基于磁盘文件的流式multipart请求体
+    
+    MultipartEncoder本身不支持回绕；重试时回到文件开头并重新构建编码器，
+    保证重发的请求体完整。
+    """
+    
+    def __init__(self, build_encoder, file):
+        self._build_encoder = build_encoder
+        self._file = file
+        self._encoder = build_encoder()
+        self._position = 0
+    
+    @property
+    def content_type(self):
+        return self._encoder.content_type
+    
+    @property
+    def len(self):
+        return self._encoder.len
+    
+    def read(self, size=-1):
+        chunk = self._encoder.read(size)
+        self._position += len(chunk)
+        return chunk
+    
+    def tell(self):
+        return self._position
+    
+    def seek(self, offset, whence=0):
+        if offset != 0 or whence != 0:
+            raise OSError("multipart请求体只支持回绕到开头")
+        self._file.seek(0)
+        self._encoder = self._build_encoder()
+        self._position = 0
+        return 0
 
 
 class Transcriber:
     """音频转文字器"""
     
+    # 流式上传时每次读取的字节数
+    STREAM_CHUNK_SIZE = 64 * 1024
+    
+    # 本地模型按(模型, 设备)缓存，同一进程内的多个实例共享
+    _local_models = {}
+    _local_models_lock = threading.Lock()
+    
     def __init__(self, config):
         self.config = config
-        self.api_key = config['whisper_api_key']
-        self.api_url = config['whisper_api_url']
-        self.model = config['whisper_model']
+        self.api_key = config.whisper_api_key
+        self.api_url = config.whisper_api_url
+        self.model = config.whisper_model
+        self.is_local = config.whisper_backend == 'local_ct2'
+        self._local_model = None
+        self.cache = get_cache(config)
+        
+        # 本地模型在首次转录时加载，只下载视频时无需加载
+        if self.is_local:
+            return
         
         if not self.api_key:
             raise ValueError("未配置Whisper API Key")
@@ -23,65 +98,147 @@ class Transcriber:
         if not self.api_url:
             raise ValueError("未配置Whisper API URL")
     
-    def transcribe(self, audio_path, language=None):
+    @property
+    def session(self):
+        """Whisper API所在主机的共享会话（首次请求时创建）"""
+        return get_session(self.api_url, self.config)
+    
+    @property
+    def streaming_session(self):
+        """流式上传使用的共享会话：请求体无法回绕，不按状态码重试，以便报告API返回的错误"""
+        return get_session(self.api_url, self.config, retries=False)
+    
+    @classmethod
+    def _load_local_model(cls, model_name, device):
+        """加载本地faster-whisper模型（CTranslate2 int8）"""
+        key = (model_name, device)
+        
+        with cls._local_models_lock:
+            if key not in cls._local_models:
+                try:
+                    from faster_whisper import WhisperModel
+                except ImportError:
+                    raise ValueError("本地Whisper需要安装faster-whisper: pip install faster-whisper")
+                
+                cls._local_models[key] = WhisperModel(model_name, device=device, compute_type='int8')
+            
+            return cls._local_models[key]
+    
+    def transcribe(self, audio, language=None):
         """
         音频转文字
         
         Args:
-            audio_path: 音频文件路径
+            audio: 音频文件路径，或可读的音频流（Ogg/Opus，如FFmpeg进程的stdout）；
+                本地模型可直接传入视频文件路径
             language: 音频语言（可选）
         
         Returns:
             str: 转录文本
         """
-        try:
-            if self.config['debug']:
-                print(f"[Transcriber] 转录音频: {audio_path}", file=sys.stderr)
+        # 流式输入无法预先计算哈希，不使用缓存
+        cache_key = None
+        if self.cache is not None and not hasattr(audio, 'read') and Path(audio).exists():
+            if self.is_local:
+                # 本地模型直接读取源视频，按路径、大小和修改时间标识，避免每次哈希整个视频
+                model = self.config.whisper_local_model
+                source = file_signature(audio)
+            else:
+                model = self.model
+                source = file_digest(audio)
             
-            # 准备请求
-            audio_file = Path(audio_path)
-            
-            if not audio_file.exists():
-                raise FileNotFoundError(f"音频文件不存在: {audio_path}")
+            cache_key = (
+                f"whisper:{self.config.whisper_backend}:{model}:"
+                f"{language or 'auto'}:vad={self.config.vad_trim}:{source}"
+            )
             
+            transcript = self.cache.get(cache_key)
+            if transcript is not None:
+                if self.config.debug:
+                    print(f"[Transcriber] 命中缓存: {audio}", file=sys.stderr)
+                return transcript
+        
+        if self.is_local:
+            transcript = self._transcribe_local(audio, language)
+        else:
+            transcript = self._transcribe_api(audio, language)
+        
+        if cache_key is not None:
+            self.cache.set(cache_key, transcript, expire=cache_expire(self.config))
+        
+        return transcript
+    
+    def _transcribe_api(self, audio, language=None):
+        """调用Whisper API转录"""
+        import requests
+        from requests_toolbelt import MultipartEncoder
+        
+        try:
             # 构建API URL
             api_url = self.api_url.rstrip('/')
             if not api_url.endswith('/audio/transcriptions'):
                 api_url = f"{api_url}/audio/transcriptions"
             
-            # 准备文件和数据
-            with open(audio_path, 'rb') as f:
-                files = {
-                    'file': (audio_file.name, f, 'audio/wav')
-                }
-                
-                data = {
-                    'model': self.model
-                }
-                
-                # 添加语言参数
-                if language and language != 'auto':
-                    data['language'] = language
+            data = {
+                'model': self.model
+            }
+            
+            # 添加语言参数
+            if language and language != 'auto':
+                data['language'] = language
+            
+            # 准备headers
+            headers = {
+                'Authorization': f'Bearer {self.api_key}'
+            }
+            
+            if hasattr(audio, 'read'):
+                if self.config.debug:
+                    print(f"[Transcriber] 流式转录音频", file=sys.stderr)
                 
-                # 准备headers
-                headers = {
-                    'Authorization': f'Bearer {self.api_key}'
-                }
+                # 分块上传，边读取FFmpeg输出边发送
+                boundary = os.urandom(16).hex()
+                headers['Content-Type'] = f'multipart/form-data; boundary={boundary}'
                 
-                # 发送请求
-                response = requests.post(
+                response = self.streaming_session.post(
                     api_url,
                     headers=headers,
-                    files=files,
-                    data=data,
+                    data=_StreamingBody(self._iter_multipart(boundary, data, audio)),
                     timeout=300
                 )
+            else:
+                if self.config.debug:
+                    print(f"[Transcriber] 转录音频: {audio}", file=sys.stderr)
+                
+                audio_file = Path(audio)
+                
+                if not audio_file.exists():
+                    raise FileNotFoundError(f"音频文件不存在: {audio}")
+                
+                # 准备文件和数据，请求体直接从文件流式读取而不整体载入内存
+                with open(audio_file, 'rb') as f:
+                    body = _FileMultipartBody(
+                        lambda: MultipartEncoder(fields={
+                            **data,
+                            'file': (audio_file.name, f, self._content_type(audio_file))
+                        }),
+                        f
+                    )
+                    headers['Content-Type'] = body.content_type
+                    
+                    # 发送请求
+                    response = self.session.post(
+                        api_url,
+                        headers=headers,
+                        data=body,
+                        timeout=300
+                    )
             
             # 检查响应
             if response.status_code != 200:
                 raise RuntimeError(f"API请求失败 ({response.status_code}): {response.text}")
 
-            if self.config['debug']:
+            if self.config.debug:
                 print(f"[Transcriber] API响应状态: {response.status_code}", file=sys.stderr)
                 print(f"[Transcriber] API响应内容: {response.text[:500]}", file=sys.stderr)
 
@@ -93,7 +250,7 @@ class Transcriber:
             
             transcript = result['text']
             
-            if self.config['debug']:
+            if self.config.debug:
                 print(f"[Transcriber] 转录完成，文本长度: {len(transcript)}", file=sys.stderr)
             
             return transcript
@@ -104,4 +261,85 @@ class Transcriber:
             raise RuntimeError(f"API请求失败: {str(e)}")
         except Exception as e:
             raise RuntimeError(f"转录失败: {str(e)}")
-
+    
+    def _transcribe_local(self, audio_path, language=None):
+        """使用本地faster-whisper模型转录"""
+        if self._local_model is None:
+            self._local_model = self._load_local_model(
+                self.config.whisper_local_model, self.config.whisper_device
+            )
+        
+        try:
+            if self.config.debug:
+                print(f"[Transcriber] 本地模型转录: {audio_path}", file=sys.stderr)
+            
+            if not Path(audio_path).exists():
+                raise FileNotFoundError(f"音频文件不存在: {audio_path}")
+            
+            segments, _ = self._local_model.transcribe(
+                str(audio_path),
+                language=None if not language or language == 'auto' else language,
+                vad_filter=self.config.vad_trim,
+                beam_size=1
+            )
+            transcript = ''.join(segment.text for segment in segments)
+            
+            if self.config.debug:
+                print(f"[Transcriber] 转录完成，文本长度: {len(transcript)}", file=sys.stderr)
+            
+            return transcript
+            
+        except Exception as e:
+            raise RuntimeError(f"转录失败: {str(e)}")
+    
+    def transcribe_many(self, audio_paths, language=None):
+        """
+        并发转录多个音频分段，按原顺序拼接结果
+        
+        Args:
+            audio_paths: 按时间顺序排列的音频文件路径列表
+            language: 音频语言（可选）
+        
+        Returns:
+            str: 拼接后的转录文本
+        """
+        if len(audio_paths) == 1:
+            return self.transcribe(audio_paths[0], language)
+        
+        max_workers = min(self.config.max_transcribe_concurrency, len(audio_paths))
+        
+        if self.config.debug:
+            print(f"[Transcriber] 并发转录{len(audio_paths)}个分段，并发数: {max_workers}", file=sys.stderr)
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            transcripts = list(executor.map(lambda path: self.transcribe(path, language), audio_paths))
+        
+        return '\n'.join(transcripts)
+    
+    @staticmethod
+    def _content_type(audio_file):
+        """根据音频文件扩展名确定上传的MIME类型"""
+        return 'audio/ogg' if audio_file.suffix == '.ogg' else 'audio/wav'
+    
+    def _iter_multipart(self, boundary, fields, stream):
+        """逐块生成multipart/form-data请求体，音频数据直接取自流"""
+        for name, value in fields.items():
+            yield (
+                f'--{boundary}\r\n'
+                f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                f'{value}\r\n'
+            ).encode('utf-8')
+        
+        yield (
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="file"; filename="audio.ogg"\r\n'
+            f'Content-Type: audio/ogg\r\n\r\n'
+        ).encode('utf-8')
+        
+        while True:
+            chunk = stream.read(self.STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+        
+        yield f'\r\n--{boundary}--\r\n'.encode('utf-8')
@@ -5,10 +5,123 @@
 
 import sys
 import os
+import re
+import stat
 from pathlib import Path
-from urllib.parse import urlparse
 import subprocess
-import uuid
+import threading
+from collections import OrderedDict, deque
+
+
+# 输入分类：file://协议、Windows盘符路径、其他带协议的URL（按远程处理）
+# file://须位于通用协议之前，否则会被当作远程协议匹配
+_URL_CLASSIFIER = re.compile(
+    r'(?P<fileproto>(?i:file)://)'
+    r'|(?P<winpath>[a-zA-Z]:[\\/])'
+    r'|(?P<scheme>[a-zA-Z][a-zA-Z0-9+.-]*://)'
+)
+
+_FILE_PREFIX = 'file://'
+
+# 支持的本地视频格式
+VALID_EXTENSIONS = frozenset(['.mp4', '.avi', '.mov', '.mkv', '.webm', '.flv', '.m4v'])
+
+# 本地文件输入到绝对路径的缓存（只缓存绝对路径输入且解析成功的结果，按最近使用淘汰）
+_LOCAL_CACHE = OrderedDict()
+_LOCAL_CACHE_SIZE = 128
+_LOCAL_CACHE_LOCK = threading.Lock()
+
+
+def _stat(path):
+    """stat路径，不存在或无法访问时返回None"""
+    try:
+        return os.stat(path)
+    except (OSError, ValueError):
+        return None
+
+
+def _classify(url):
+    """
+    按前缀对输入分类（不访问文件系统）
+    
+    Returns:
+        str: 'fileproto'、'winpath'、'scheme'，无法从前缀判断时返回None
+    """
+    match = _URL_CLASSIFIER.match(url)
+    return match.lastgroup if match else None
+
+
+def _handle_local_file(url, st):
+    """校验本地文件并返回其绝对路径（st为url的stat结果）"""
+    # 移除file://前缀（协议名不区分大小写）
+    has_prefix = url[:len(_FILE_PREFIX)].lower() == _FILE_PREFIX
+    if has_prefix:
+        url = url[len(_FILE_PREFIX):]
+    
+    # 先检查文件格式，不支持的格式无需访问文件系统
+    suffix = os.path.splitext(url)[1]
+    if suffix.lower() not in VALID_EXTENSIONS:
+        raise ValueError(f"不支持的视频格式: {suffix}")
+    
+    # 一次stat同时判断是否存在及是否为普通文件
+    if has_prefix:
+        st = _stat(url)
+    
+    if st is None:
+        raise FileNotFoundError(f"本地文件不存在: {url}")
+    
+    if not stat.S_ISREG(st.st_mode):
+        raise ValueError(f"不是有效的文件: {url}")
+    
+    # 已是绝对路径时直接返回，无需获取当前目录
+    if os.path.isabs(url):
+        return url
+    
+    return os.path.abspath(url)
+
+
+def _resolve_local(url):
+    """
+    解析本地文件输入
+    
+    Args:
+        url: 视频URL或本地文件路径
+    
+    Returns:
+        str: 本地文件的绝对路径，不是本地文件时返回None
+    """
+    kind = _classify(url)
+    
+    # 带协议的远程URL直接返回，不做文件系统调用
+    if kind == 'scheme':
+        return None
+    
+    # file://协议在去除前缀后再stat
+    if kind == 'fileproto':
+        return _handle_local_file(url, None)
+    
+    st = _stat(url)
+    
+    # 无法从前缀判断且路径不存在时按远程URL处理
+    if st is None and kind is None:
+        return None
+    
+    return _handle_local_file(url, st)
+
+
+class _YtdlpLogger:
+    """yt-dlp日志输出到stderr（仅调试模式），避免污染stdout上的JSON结果"""
+    
+    def __init__(self, debug):
+        self.debug_enabled = debug
+    
+    def debug(self, msg):
+        if self.debug_enabled:
+            print(f"[VideoDownloader] {msg}", file=sys.stderr)
+    
+    info = debug
+    warning = debug
+    error = debug
 
 
 class VideoDownloader:
@@ -16,7 +129,65 @@ class VideoDownloader:
     
     def __init__(self, config):
         self.config = config
-        self.temp_dir = config['temp_dir']
+        self._debug = config.debug
+        self.temp_dir = config.temp_dir
+        
+        # yt-dlp子进程命令中与URL无关的部分（使用Python模块方式）
+        self._cmd_prefix = (
+            sys.executable,  # Python解释器
+            '-m', 'yt_dlp',
+            '-f', config.ytdlp_format,
+            '--no-playlist',
+            '--quiet',
+            '--no-warnings',
+            '--print', 'after_move:filepath'  # 下载完成后在stdout输出最终文件路径
+        )
+        
+        if config.use_shm:
+            self.temp_dir = self._create_shm_dir() or self.temp_dir
+        
+        # 临时目录的字符串形式，拼接文件名时不再构造Path对象
+        self._temp_dir_str = str(self.temp_dir)
+        self._output_template_prefix = self._temp_dir_str + os.sep
+        
+        # 临时目录只打开一次，下载后按文件描述符扫描，省去每次的路径解析（Windows不支持，回退为按路径扫描）
+        self._temp_dir_fd = None
+        if os.scandir in os.supports_fd:
+            try:
+                self._temp_dir_fd = os.open(self._temp_dir_str, os.O_RDONLY | os.O_DIRECTORY)
+            except OSError:
+                pass
+    
+    def close(self):
+        """关闭临时目录的文件描述符"""
+        fd, self._temp_dir_fd = getattr(self, '_temp_dir_fd', None), None
+        if fd is not None:
+            os.close(fd)
+    
+    def __del__(self):
+        self.close()
+    
+    def _create_shm_dir(self):
+        """在/dev/shm（tmpfs）下创建下载暂存目录，进程退出时删除；不可用时返回None"""
+        import atexit
+        import shutil
+        import tempfile
+        
+        shm = '/dev/shm'
+        if not sys.platform.startswith('linux') or not os.path.isdir(shm) or not os.access(shm, os.W_OK):
+            return None
+        
+        try:
+            shm_dir = Path(tempfile.mkdtemp(prefix='vcp_video_', dir=shm))
+        except OSError:
+            return None
+        
+        atexit.register(shutil.rmtree, shm_dir, ignore_errors=True)
+        
+        if self._debug:
+            print(f"[VideoDownloader] 使用内存暂存目录: {shm_dir}", file=sys.stderr)
+        
+        return shm_dir
     
     def download(self, url):
         """
@@ -28,105 +199,286 @@ class VideoDownloader:
         Returns:
             str: 视频文件路径
         """
-        # 检查是否为本地文件
-        if self._is_local_file(url):
-            return self._handle_local_file(url)
+        local_path = self._local_path(url)
+        if local_path is not None:
+            return local_path
         
         # 下载远程视频
         return self._download_remote_video(url)
     
-    def _is_local_file(self, url):
-        """检查是否为本地文件"""
-        # 检查是否为文件路径
-        if os.path.exists(url):
-            return True
+    def _local_path(self, url):
+        """获取本地文件输入的绝对路径，不是本地文件时返回None"""
+        with _LOCAL_CACHE_LOCK:
+            local_path = _LOCAL_CACHE.get(url)
         
-        # 检查是否为file://协议
-        parsed = urlparse(url)
-        if parsed.scheme == 'file':
-            return True
+        # 命中缓存时只需一次stat确认文件仍存在，省去重新解析
+        if local_path is not None and not os.path.isfile(local_path):
+            # 缓存的文件已被删除或替换，只移除该条目
+            with _LOCAL_CACHE_LOCK:
+                _LOCAL_CACHE.pop(url, None)
+            local_path = None
         
-        # 检查是否为Windows路径
-        if ':' in url and not url.startswith('http'):
-            return True
+        if local_path is None:
+            # "不是本地文件"的结论不缓存，之前不存在的路径可能已被创建
+            local_path = _resolve_local(url)
+            if local_path is None:
+                return None
+            
+            # 相对路径的解析结果取决于当前目录，不缓存
+            if os.path.isabs(url):
+                with _LOCAL_CACHE_LOCK:
+                    _LOCAL_CACHE[url] = local_path
+                    if len(_LOCAL_CACHE) > _LOCAL_CACHE_SIZE:
+                        _LOCAL_CACHE.popitem(last=False)
+        else:
+            with _LOCAL_CACHE_LOCK:
+                if url in _LOCAL_CACHE:
+                    _LOCAL_CACHE.move_to_end(url)
         
-        return False
-    
-    def _handle_local_file(self, url):
-        """处理本地文件"""
-        # 移除file://前缀
-        if url.startswith('file://'):
-            url = url[7:]
+        if self._debug:
+            print(f"[VideoDownloader] 使用本地文件: {local_path}", file=sys.stderr)
         
-        # 转换为Path对象
-        path = Path(url)
+        return local_path
+    
+    async def download_many(self, urls, concurrency=4):
+        """
+        并发下载多个视频
         
-        if not path.exists():
-            raise FileNotFoundError(f"本地文件不存在: {url}")
+        Args:
+            urls: 视频URL或本地文件路径列表
+            concurrency: 最大并发下载数
         
-        if not path.is_file():
-            raise ValueError(f"不是有效的文件: {url}")
+        Returns:
+            list: 与urls顺序一致的视频文件路径
+        """
+        import asyncio
         
-        # 检查文件格式
-        valid_extensions = ['.mp4', '.avi', '.mov', '.mkv', '.webm', '.flv', '.m4v']
-        if path.suffix.lower() not in valid_extensions:
-            raise ValueError(f"不支持的视频格式: {path.suffix}")
+        semaphore = asyncio.Semaphore(concurrency)
         
-        if self.config['debug']:
-            print(f"[VideoDownloader] 使用本地文件: {path}", file=sys.stderr)
+        async def download_one(url):
+            async with semaphore:
+                return await asyncio.to_thread(self.download, url)
         
-        return str(path.absolute())
+        return await asyncio.gather(*(download_one(url) for url in urls))
     
     def _download_remote_video(self, url):
         """下载远程视频"""
         try:
-            # 生成临时文件名
-            video_id = str(uuid.uuid4())
-            output_template = str(self.temp_dir / f"{video_id}.%(ext)s")
+            # 生成临时文件名（64位随机数）
+            video_id = os.urandom(8).hex()
+            output_template = f"{self._output_template_prefix}{video_id}.%(ext)s"
             
-            if self.config['debug']:
+            if self._debug:
                 print(f"[VideoDownloader] 下载视频: {url}", file=sys.stderr)
             
-            # 使用yt-dlp下载（使用Python模块方式）
-            cmd = [
-                sys.executable,  # Python解释器
-                '-m', 'yt_dlp',
-                '-f', self.config['ytdlp_format'],
-                '-o', output_template,
-                '--no-playlist',
-                '--quiet',
-                '--no-warnings',
-                url
-            ]
-            
-            # 执行下载
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=self.config['download_timeout']
-            )
-            
-            if result.returncode != 0:
-                raise RuntimeError(f"视频下载失败: {result.stderr}")
-            
-            # 查找下载的文件
-            downloaded_files = list(self.temp_dir.glob(f"{video_id}.*"))
-            
-            if not downloaded_files:
-                raise RuntimeError("下载完成但未找到文件")
-            
-            video_path = str(downloaded_files[0])
+            if self.config.ytdlp_in_process:
+                video_path = self._download_in_process(url, output_template)
+            else:
+                video_path = self._download_subprocess(url, output_template, video_id)
             
-            if self.config['debug']:
+            if self._debug:
                 print(f"[VideoDownloader] 下载完成: {video_path}", file=sys.stderr)
             
             return video_path
             
         except subprocess.TimeoutExpired:
-            raise RuntimeError(f"下载超时（{self.config['download_timeout']}秒）")
+            raise RuntimeError(f"下载超时（{self.config.download_timeout}秒）")
         except FileNotFoundError:
             raise RuntimeError("未找到yt-dlp，请先安装: pip install yt-dlp")
         except Exception as e:
             raise RuntimeError(f"下载失败: {str(e)}")
+    
+    def _download_in_process(self, url, output_template):
+        """在当前进程内调用yt-dlp下载，省去子进程和解释器启动开销（总时长不受DOWNLOAD_TIMEOUT限制）"""
+        try:
+            from yt_dlp import YoutubeDL
+        except ImportError:
+            raise RuntimeError("未找到yt-dlp，请先安装: pip install yt-dlp")
+        
+        opts = {
+            'format': self.config.ytdlp_format,
+            'outtmpl': output_template,
+            'noplaylist': True,
+            'quiet': True,
+            'no_warnings': True,
+            'noprogress': True,
+            # 进程内无法强制终止下载，以套接字超时避免连接停滞时永久挂起
+            'socket_timeout': min(self.config.download_timeout, 60),
+            'logger': _YtdlpLogger(self._debug)
+        }
+        
+        # 输出模板含本次下载的ID，每次下载新建实例
+        with YoutubeDL(opts) as ydl:
+            info = ydl.extract_info(url, download=True)
+            
+            # 合并/转封装后的最终路径记录在requested_downloads中
+            downloads = info.get('requested_downloads') or []
+            video_path = downloads[0].get('filepath') if downloads else None
+            if not video_path:
+                video_path = ydl.prepare_filename(info)
+        
+        if not os.path.exists(video_path):
+            raise RuntimeError("下载完成但未找到文件")
+        
+        return video_path
+    
+    def _download_subprocess(self, url, output_template, video_id):
+        """在子进程中运行yt-dlp下载，超时可强制终止"""
+        cmd = (*self._cmd_prefix, '-o', output_template, url)
+        
+        # 执行下载，输出边读取边丢弃，只保留最后若干行
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+        
+        stdout_lines = deque(maxlen=8)
+        stderr_lines = deque(maxlen=64)
+        readers = [
+            threading.Thread(target=self._drain, args=(process.stdout, stdout_lines), daemon=True),
+            threading.Thread(target=self._drain, args=(process.stderr, stderr_lines), daemon=True)
+        ]
+        for reader in readers:
+            reader.start()
+        
+        try:
+            process.wait(timeout=self.config.download_timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            raise
+        finally:
+            for reader in readers:
+                reader.join()
+        
+        if process.returncode != 0:
+            stderr = '\n'.join(stderr_lines)
+            raise RuntimeError(f"视频下载失败: {stderr}")
+        
+        # 优先使用yt-dlp输出的路径，缺失时按文件名前缀查找
+        if stdout_lines and os.path.exists(stdout_lines[-1]):
+            return stdout_lines[-1]
+        
+        return self._find_downloaded_file(video_id)
+    
+    @staticmethod
+    def _drain(stream, lines):
+        """逐行读取子进程输出，只保留最后若干行"""
+        with stream:
+            for line in stream:
+                if line.strip():
+                    lines.append(line.rstrip('\n'))
+    
+    def _find_downloaded_file(self, video_id):
+        """在临时目录中查找以video_id命名的下载文件"""
+        prefix = f"{video_id}."
+        
+        # 按文件描述符扫描时entry.path只有文件名，统一用目录前缀拼接完整路径
+        target = self._temp_dir_fd if self._temp_dir_fd is not None else self._temp_dir_str
+        
+        with os.scandir(target) as entries:
+            for entry in entries:
+                if entry.name.startswith(prefix) and not entry.name.endswith('.part'):
+                    return self._output_template_prefix + entry.name
+        
+        raise RuntimeError("下载完成但未找到文件")
+
 
+class BatchDownloader(VideoDownloader):
+    """
+    批量下载器
+    
+    一个yt-dlp子进程通过批处理文件（-a -）下载一批URL，
+    整批只需一次解释器启动和yt-dlp导入。
+    """
+    
+    def download_batch(self, urls):
+        """
+        批量下载视频
+        
+        Args:
+            urls: 视频URL或本地文件路径列表
+        
+        Returns:
+            list: 与urls顺序一致的视频文件路径，下载失败的URL对应None
+        """
+        paths = [self._local_path(url) for url in urls]
+        
+        remote_urls = list(dict.fromkeys(url for url, path in zip(urls, paths) if path is None))
+        if not remote_urls:
+            return paths
+        
+        downloaded = self._run_batch(remote_urls)
+        
+        return [path if path is not None else downloaded.get(url) for url, path in zip(urls, paths)]
+    
+    def _run_batch(self, urls):
+        """运行一个yt-dlp进程下载整批URL，返回URL到文件路径的映射"""
+        batch_id = os.urandom(8).hex()
+        cmd = (
+            sys.executable,  # Python解释器
+            '-m', 'yt_dlp',
+            '-f', self.config.ytdlp_format,
+            '--no-playlist',
+            '--quiet',
+            '--no-warnings',
+            '-a', '-',  # 从stdin读取URL列表
+            '-o', f"{self._output_template_prefix}{batch_id}_%(autonumber)s.%(ext)s",
+            '--print', 'after_move:%(original_url)s\t%(filepath)s'  # 每个下载完成后输出URL与文件路径
+        )
+        timeout = self.config.download_timeout * len(urls)
+        
+        if self._debug:
+            print(f"[VideoDownloader] 批量下载{len(urls)}个视频", file=sys.stderr)
+        
+        try:
+            process = subprocess.Popen(
+                cmd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True
+            )
+        except FileNotFoundError:
+            raise RuntimeError("未找到yt-dlp，请先安装: pip install yt-dlp")
+        
+        stdout_lines = deque()
+        stderr_lines = deque(maxlen=64)
+        readers = [
+            threading.Thread(target=self._drain, args=(process.stdout, stdout_lines), daemon=True),
+            threading.Thread(target=self._drain, args=(process.stderr, stderr_lines), daemon=True)
+        ]
+        for reader in readers:
+            reader.start()
+        
+        # yt-dlp读完整个批处理文件后才开始下载，因此一次写入全部URL并关闭stdin
+        try:
+            process.stdin.write(''.join(f"{url}\n" for url in urls))
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            raise RuntimeError(f"批量下载超时（{timeout}秒）")
+        finally:
+            for reader in readers:
+                reader.join()
+        
+        # 单个URL失败时yt-dlp继续下载其余URL，退出码非0
+        if process.returncode != 0 and self._debug:
+            stderr = '\n'.join(stderr_lines)
+            print(f"[VideoDownloader] 部分视频下载失败: {stderr}", file=sys.stderr)
+        
+        downloaded = {}
+        for line in stdout_lines:
+            url, _, filepath = line.partition('\t')
+            if filepath and os.path.exists(filepath):
+                downloaded[url] = filepath
+        
+        return downloaded